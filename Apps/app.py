@@ -1,25 +1,62 @@
 import dash
-from dash import html, dcc, Input, Output, State, callback_context, dash_table
-import psycopg
+from dash import html, dcc, Input, Output, State, ClientsideFunction, callback_context, dash_table, no_update, CeleryManager, DiskcacheManager
+import asyncio
+import asyncpg
+import base64
+import diskcache
+import gzip
 import os
+import threading
 import time
+from cachetools import TTLCache
+from celery import Celery
 from databricks import sdk
-from psycopg import sql
-from psycopg_pool import ConnectionPool
-import pandas as pd
+from flask import request
+from werkzeug.serving import is_running_from_reloader
 from dotenv import load_dotenv
 from openai import OpenAI
-import json
+import orjson
+import plotly.io as pio
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Dash serializes callback responses through plotly's JSON encoder; pin it
+# to orjson rather than relying on "auto" finding the package
+pio.json.config.default_engine = 'orjson'
+
 # Database connection setup
 workspace_client = None
 postgres_password = None
 last_password_refresh = 0
 connection_pool = None
+connection_pool_lock = threading.Lock()
 connection_status = {"status": "not_initialized", "message": ""}
+TOKEN_REFRESH_INTERVAL = 900  # seconds
+
+# asyncpg is asyncio-only, so all database work runs on one event loop in a
+# background thread and Dash callbacks submit coroutines to it
+db_loop = asyncio.new_event_loop()
+threading.Thread(target=db_loop.run_forever, name="db-loop", daemon=True).start()
+
+def run_on_db_loop(coro):
+    """Run a coroutine on the database event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, db_loop).result()
+
+# Short-lived caches for query results; the same retailers get searched
+# repeatedly and the same device lists repeat across users
+query_cache_lock = threading.Lock()
+dashboard_data_cache = TTLCache(maxsize=512, ttl=60)
+# Off by default: picking the busiest retailers scans the whole orders table
+PREWARM_RETAILER_COUNT = int(os.getenv('PREWARM_RETAILER_COUNT', '0'))
+
+# Orders are paged server-side; only the visible page is sent to the browser
+ORDERS_PAGE_SIZE = 10
+ORDER_COLUMNS = ['order_id', 'order_date', 'device_name', 'quantity']
+ORDER_SORT_COLUMNS = set(ORDER_COLUMNS)
+
+# The adverse events section lists each device's most recent events
+ADVERSE_EVENTS_PER_DEVICE = 20
 
 def initialize_databricks_client():
     """Initialize Databricks client with error handling."""
@@ -45,11 +82,15 @@ def initialize_databricks_client():
         print(f"❌ Databricks initialization error: {e}")
         return False
 
-def refresh_oauth_token():
-    """Refresh OAuth token if expired."""
+def token_stale():
+    """Check whether the cached OAuth token is due for a refresh."""
+    return postgres_password is None or time.time() - last_password_refresh > TOKEN_REFRESH_INTERVAL
+
+def refresh_oauth_token(force=False):
+    """Refresh OAuth token if expired (or always, when forced)."""
     global postgres_password, last_password_refresh, connection_status
     
-    if postgres_password is None or time.time() - last_password_refresh > 900:
+    if force or token_stale():
         print("Refreshing PostgreSQL OAuth token")
         
         # Initialize Databricks client if not already done
@@ -72,79 +113,110 @@ def refresh_oauth_token():
             return False
     return True
 
+def get_connect_kwargs():
+    """Build asyncpg connection arguments from the environment and current token."""
+    server_settings = {}
+    if os.getenv('PGAPPNAME'):
+        server_settings['application_name'] = os.getenv('PGAPPNAME')
+    return {
+        'database': os.getenv('PGDATABASE'),
+        'user': os.getenv('PGUSER'),
+        'password': postgres_password,
+        'host': os.getenv('PGHOST'),
+        'port': int(os.getenv('PGPORT')),
+        'ssl': os.getenv('PGSSLMODE', 'require'),
+        'server_settings': server_settings
+    }
+
+async def create_connection_pool(**pool_kwargs):
+    """Create and initialize an asyncpg pool on the database event loop."""
+    return await asyncpg.create_pool(**pool_kwargs)
+
+def update_pool_password():
+    """Use the current OAuth token for new pool connections."""
+    if connection_pool is None:
+        return
+    
+    # Connections already open stay authenticated, so they keep serving
+    # queries; only connections opened from now on use the new token
+    connect_kwargs = get_connect_kwargs()
+    db_loop.call_soon_threadsafe(lambda: connection_pool.set_connect_args(**connect_kwargs))
+    connection_status["status"] = "connected"
+    connection_status["message"] = f"Connected to {os.getenv('PGHOST')}"
+
+def scheduled_token_refresh():
+    """Refresh the OAuth token ahead of expiry, then schedule the next refresh."""
+    if refresh_oauth_token(force=True):
+        update_pool_password()
+    schedule_token_refresh()
+
+def schedule_token_refresh():
+    """Schedule a token refresh 60 seconds before the current token goes stale."""
+    timer = threading.Timer(TOKEN_REFRESH_INTERVAL - 60, scheduled_token_refresh)
+    timer.daemon = True
+    timer.start()
+
 def get_connection_pool():
     """Get or create the connection pool."""
     global connection_pool, connection_status
     
-    if connection_pool is None:
-        # Check environment variables
-        required_vars = ['PGDATABASE', 'PGUSER', 'PGHOST', 'PGPORT', 'PGSCHEMA']
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
+    # Refresh an expired token in place rather than closing the pool
+    if connection_pool is not None and token_stale():
+        if refresh_oauth_token():
+            update_pool_password()
+    
+    # Serialize pool creation so a search arriving during the startup warm-up
+    # waits for that pool instead of opening a second one
+    with connection_pool_lock:
+        if connection_pool is None:
+            # Check environment variables
+            required_vars = ['PGDATABASE', 'PGUSER', 'PGHOST', 'PGPORT', 'PGSCHEMA']
+            missing_vars = [var for var in required_vars if not os.getenv(var)]
         
-        if missing_vars:
-            connection_status["status"] = "env_error"
-            connection_status["message"] = f"Missing environment variables: {', '.join(missing_vars)}"
-            print(f"❌ Missing environment variables: {', '.join(missing_vars)}")
-            print("💡 Run 'python3 setup_env.py' to configure them")
-            return None
+            if missing_vars:
+                connection_status["status"] = "env_error"
+                connection_status["message"] = f"Missing environment variables: {', '.join(missing_vars)}"
+                print(f"❌ Missing environment variables: {', '.join(missing_vars)}")
+                print("💡 Run 'python3 setup_env.py' to configure them")
+                return None
         
-        if not refresh_oauth_token():
-            return None
+            if not refresh_oauth_token():
+                return None
             
-        if not postgres_password:
-            connection_status["status"] = "token_error"
-            connection_status["message"] = "No OAuth token available"
-            return None
+            if not postgres_password:
+                connection_status["status"] = "token_error"
+                connection_status["message"] = "No OAuth token available"
+                return None
         
-        try:
-            conn_string = (
-                f"dbname={os.getenv('PGDATABASE')} "
-                f"user={os.getenv('PGUSER')} "
-                f"password={postgres_password} "
-                f"host={os.getenv('PGHOST')} "
-                f"port={os.getenv('PGPORT')} "
-                f"sslmode={os.getenv('PGSSLMODE', 'require')} "
-                f"application_name={os.getenv('PGAPPNAME')}"
-            )
-            connection_pool = ConnectionPool(conn_string, min_size=2, max_size=10)
-            connection_status["status"] = "connected"
-            connection_status["message"] = f"Connected to {os.getenv('PGHOST')}"
-            print(f"✅ Database connection pool created for {os.getenv('PGHOST')}")
-        except Exception as e:
-            connection_status["status"] = "connection_error"
-            connection_status["message"] = f"Failed to create connection pool: {str(e)}"
-            print(f"❌ Failed to create connection pool: {str(e)}")
-            print("💡 Run 'python3 debug_connection.py' to diagnose the issue")
-            return None
+            try:
+                connection_pool = run_on_db_loop(create_connection_pool(
+                    min_size=5,
+                    max_size=25,  # Keep well below the server's max_connections
+                    max_inactive_connection_lifetime=900,
+                    **get_connect_kwargs()
+                ))
+                schedule_token_refresh()
+                connection_status["status"] = "connected"
+                connection_status["message"] = f"Connected to {os.getenv('PGHOST')}"
+                print(f"✅ Database connection pool created for {os.getenv('PGHOST')}")
+            except Exception as e:
+                connection_status["status"] = "connection_error"
+                connection_status["message"] = f"Failed to create connection pool: {str(e)}"
+                print(f"❌ Failed to create connection pool: {str(e)}")
+                print("💡 Run 'python3 debug_connection.py' to diagnose the issue")
+                return None
     
     return connection_pool
 
-def get_connection():
-    """Get a connection from the pool."""
-    global connection_pool
-    
-    # Recreate pool if token expired
-    if postgres_password is None or time.time() - last_password_refresh > 900:
-        if connection_pool:
-            connection_pool.close()
-            connection_pool = None
-    
-    pool = get_connection_pool()
-    if pool is None:
-        return None
-    
-    try:
-        return pool.connection()
-    except Exception as e:
-        print(f"❌ Failed to get connection from pool: {str(e)}")
-        connection_status["status"] = "connection_error"
-        connection_status["message"] = f"Failed to get connection: {str(e)}"
-        return None
-
 def get_connection_status():
     """Get current connection status for display."""
     return connection_status
 
+def status_trigger_update(last_status):
+    """Return the status for the status-trigger store, or no_update if it hasn't changed."""
+    status = connection_status["status"]
+    return status if status != last_status else no_update
+
 def analyze_adverse_event_with_databricks(event_description):
     """Analyze adverse event description using Databricks API."""
     try:
@@ -174,109 +246,202 @@ def analyze_adverse_event_with_databricks(event_description):
         content = response.choices[0].message.content
         try:
             # Try to parse as JSON first
-            parsed_content = json.loads(content)
+            parsed_content = orjson.loads(content)
             return {"success": True, "data": parsed_content}
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             # If not JSON, return as formatted text
             return {"success": True, "data": {"analysis": content}}
             
     except Exception as e:
         return {"error": f"Failed to analyze adverse event: {str(e)}"}
 
-def get_retailer_orders(retailer_name):
-    """Get all orders for a specific retailer."""
+async def fetch_orders_page(pool, retailer_name, page_current, page_size, sort_by):
+    """Fetch one page of a retailer's orders (column-oriented) and their total count."""
+    # Only whitelisted column names are interpolated into ORDER BY; order_id
+    # breaks ties so pages don't overlap
+    order_by = 'order_id'
+    if sort_by and sort_by[0].get('column_id') in ORDER_SORT_COLUMNS:
+        direction = 'DESC' if sort_by[0].get('direction') == 'desc' else 'ASC'
+        order_by = f"{sort_by[0]['column_id']} {direction}, order_id"
+    
+    schema = os.getenv('PGSCHEMA', 'mma')
+    query = f"""
+        SELECT order_id, TO_CHAR(order_date, 'YYYY-MM-DD') AS order_date, device_name, quantity,
+               COUNT(*) OVER () AS total_orders
+        FROM {schema}.synced_order_table_feallstars
+        WHERE LOWER(retailer_name) = LOWER($1)  -- idx_order_retailer_lower
+        ORDER BY {order_by}
+        LIMIT $2 OFFSET $3
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, retailer_name, page_size, page_current * page_size)
+    
+    total_orders = rows[0]['total_orders'] if rows else 0
+    # Column lists rather than one dict per row, so each key is serialized once
+    orders = {column: [row[column] for row in rows] for column in ORDER_COLUMNS}
+    return orders, total_orders
+
+async def fetch_dashboard_data(pool, retailer_name):
+    """Fetch the first page of a retailer's orders, their count and adverse events."""
+    schema = os.getenv('PGSCHEMA', 'mma')
+    # One call to the get_retailer_dashboard function (migrations/004) returns
+    # everything the dashboard shows, so a search is a single round trip
+    query = f"""
+        SELECT orders, total_orders, adverse_events
+        FROM {schema}.get_retailer_dashboard($1, $2, $3)
+    """
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(query, retailer_name, ORDERS_PAGE_SIZE, ADVERSE_EVENTS_PER_DEVICE)
+    return orjson.loads(row['orders']), row['total_orders'], orjson.loads(row['adverse_events'])
+
+def set_query_status(error=None):
+    """Report a failed query in the connection status, or clear an earlier failure."""
+    if error is not None:
+        connection_status["status"] = "query_error"
+        connection_status["message"] = error
+    elif connection_status["status"] == "query_error":
+        connection_status["status"] = "connected"
+        connection_status["message"] = f"Connected to {os.getenv('PGHOST')}"
+
+def get_dashboard_data(retailer_name):
+    """Get the first page of orders for a retailer, its order count and adverse events.
+    
+    Returns None when the database query fails, so callers can tell an error
+    from a retailer with no orders.
+    """
+    cache_key = retailer_name.strip().lower()
+    with query_cache_lock:
+        dashboard_data = dashboard_data_cache.get(cache_key)
+    if dashboard_data is not None:
+        return dashboard_data
+    
+    pool = get_connection_pool()
+    if pool is None:
+        print("❌ Cannot get retailer orders: No database connection")
+        return None
+    
     try:
-        with get_connection() as conn:
-            if conn is None:
-                print("❌ Cannot get retailer orders: No database connection")
-                return []
-            with conn.cursor() as cur:
-                schema = os.getenv('PGSCHEMA', 'mma')
-                # Optimized query: Remove ORDER BY to avoid sorting millions of records
-                # Just get first 100 matches without sorting for speed
-                query = f"""
-                    SELECT order_id, order_date, device_name, quantity
-                    FROM {schema}.synced_order_table_feallstars
-                    WHERE LOWER(retailer_name) = LOWER(%s)
-                    LIMIT 100
-                """
-                cur.execute(query, (retailer_name.strip(),))
-                results = cur.fetchall()
-                
-                # Convert to list of dictionaries for easier handling
-                orders = []
-                for row in results:
-                    orders.append({
-                        'order_id': row[0],
-                        'order_date': row[1],
-                        'device_name': row[2],
-                        'quantity': row[3]
-                    })
-                print(f"✅ Found {len(orders)} orders for retailer: {retailer_name}")
-                return orders
-    except psycopg.Error as e:
+        orders, total_orders, adverse_events = run_on_db_loop(
+            fetch_dashboard_data(pool, retailer_name.strip())
+        )
+        set_query_status()
+        # Only successful lookups are cached so errors are retried on the next search
+        with query_cache_lock:
+            dashboard_data_cache[cache_key] = (orders, total_orders, adverse_events)
+        total_events = sum(len(events) for events in adverse_events.values())
+        print(f"✅ Found {total_orders} orders for retailer: {retailer_name}")
+        print(f"✅ Found {total_events} adverse events for {len(adverse_events)} devices")
+        return orders, total_orders, adverse_events
+    except asyncpg.UndefinedFunctionError as e:
         print(f"❌ Database error getting retailer orders: {e}")
-        return []
+        print("💡 Run migrations/004_retailer_dashboard_function.sql to create it")
+        set_query_status(f"Retailer search failed: {e.message} (run migrations/004_retailer_dashboard_function.sql)")
+        return None
+    except asyncpg.PostgresError as e:
+        print(f"❌ Database error getting retailer orders: {e}")
+        set_query_status(f"Retailer search failed: {e.message}")
+        return None
     except Exception as e:
         print(f"❌ Unexpected error getting retailer orders: {e}")
-        return []
+        set_query_status(f"Retailer search failed: {e}")
+        return None
 
-def get_device_adverse_events(device_names):
-    """Get adverse events for a list of device names."""
-    if not device_names:
+def get_orders_page(retailer_name, page_current, page_size, sort_by):
+    """Get one page of a retailer's orders for the orders table."""
+    pool = get_connection_pool()
+    if pool is None:
+        print("❌ Cannot get retailer orders: No database connection")
         return {}
     
     try:
-        with get_connection() as conn:
-            if conn is None:
-                print("❌ Cannot get adverse events: No database connection")
-                return {}
-            with conn.cursor() as cur:
-                # Limit device names to prevent parameter overflow (PostgreSQL limit is 65535)
-                limited_device_names = device_names[:1000]  # Limit to first 1000 unique devices
-                
-                # Create placeholders for the IN clause
-                placeholders = ','.join(['%s'] * len(limited_device_names))
-                schema = os.getenv('PGSCHEMA', 'mma')
-                query = f"""
-                    SELECT device_name, event_date, adverse_event_description, severity_level
-                    FROM {schema}.synced_table_adverse_events
-                    WHERE device_name IN ({placeholders})
-                    ORDER BY event_date DESC, severity_level
-                """
-                cur.execute(query, limited_device_names)
-                results = cur.fetchall()
-                
-                # Convert to list of dictionaries grouped by device
-                adverse_events = {}
-                total_events = 0
-                for row in results:
-                    device_name = row[0]
-                    if device_name not in adverse_events:
-                        adverse_events[device_name] = []
-                    
-                    adverse_events[device_name].append({
-                        'event_date': row[1],
-                        'adverse_event_description': row[2],
-                        'severity_level': row[3]
-                    })
-                    total_events += 1
-                
-                print(f"✅ Found {total_events} adverse events for {len(adverse_events)} devices")
-                return adverse_events
-    except psycopg.Error as e:
-        print(f"❌ Database error getting adverse events: {e}")
+        orders, _ = run_on_db_loop(
+            fetch_orders_page(pool, retailer_name, page_current, page_size, sort_by)
+        )
+        set_query_status()
+        return orders
+    except asyncpg.PostgresError as e:
+        print(f"❌ Database error getting orders page: {e}")
+        set_query_status(f"Loading orders failed: {e.message}")
         return {}
     except Exception as e:
-        print(f"❌ Unexpected error getting adverse events: {e}")
+        print(f"❌ Unexpected error getting orders page: {e}")
+        set_query_status(f"Loading orders failed: {e}")
         return {}
 
-def get_unique_device_names(orders):
-    """Extract unique device names from orders."""
-    return list(set([order['device_name'] for order in orders if order['device_name']]))
+def compress_store_data(data):
+    """Serialize data for a dcc.Store as base64-encoded gzipped JSON."""
+    return base64.b64encode(gzip.compress(orjson.dumps(data))).decode()
+
+def decompress_store_data(encoded):
+    """Load data written by compress_store_data."""
+    return orjson.loads(gzip.decompress(base64.b64decode(encoded)))
+
+def orders_to_records(orders):
+    """Convert column-oriented orders into the list of row dicts DataTable expects."""
+    return [dict(zip(orders, values)) for values in zip(*orders.values())]
+
+async def fetch_top_retailers(pool, limit):
+    """Fetch the retailers with the most orders."""
+    schema = os.getenv('PGSCHEMA', 'mma')
+    query = f"""
+        SELECT retailer_name
+        FROM {schema}.synced_order_table_feallstars
+        GROUP BY retailer_name
+        ORDER BY COUNT(*) DESC
+        LIMIT $1
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, limit)
+    return [row['retailer_name'] for row in rows]
 
-# Initialize Dash app
-app = dash.Dash(__name__)
+def prewarm_retailer_cache():
+    """Load orders and adverse events for the busiest retailers into the caches."""
+    if PREWARM_RETAILER_COUNT <= 0:
+        return
+    
+    pool = get_connection_pool()
+    if pool is None:
+        print("❌ Cannot pre-warm cache: No database connection")
+        return
+    
+    try:
+        retailer_names = run_on_db_loop(fetch_top_retailers(pool, PREWARM_RETAILER_COUNT))
+    except Exception as e:
+        print(f"❌ Failed to pre-warm cache: {e}")
+        return
+    
+    for retailer_name in retailer_names:
+        get_dashboard_data(retailer_name)
+    print(f"✅ Pre-warmed cache for {len(retailer_names)} retailers")
+
+def warm_up_database():
+    """Fetch the OAuth token, open the connection pool and pre-warm the caches."""
+    # Creating the pool refreshes the token and opens its min_size connections,
+    # so the first search after a restart finds them ready
+    if get_connection_pool() is None:
+        return
+    prewarm_retailer_cache()
+
+# Slow AI analysis runs as a background callback: on Celery workers when
+# Redis is configured, otherwise in a local diskcache-backed process
+if os.getenv('REDIS_URL'):
+    celery_app = Celery(__name__, broker=os.environ['REDIS_URL'], backend=os.environ['REDIS_URL'])
+    background_callback_manager = CeleryManager(celery_app)
+else:
+    background_callback_manager = DiskcacheManager(diskcache.Cache("./cache"))
+
+# Initialize Dash app; the orders table is created by a callback, so its
+# callbacks reference IDs that aren't in the initial layout
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
+
+@app.server.after_request
+def add_cache_headers(response):
+    """Let browsers briefly reuse files from assets/."""
+    # Only static assets: Flask serves them as no-cache, and Dash's own routes
+    # (layout, dependencies, dev tools' /_reload-hash) must stay fresh
+    if request.method == 'GET' and request.path.startswith(app.get_asset_url('')):
+        response.headers['Cache-Control'] = 'private, max-age=30'
+    return response
 
 # Initialize Databricks client at startup
 initialize_databricks_client()
@@ -395,15 +560,20 @@ app.layout = html.Div([
     dcc.Store(id='adverse-events-store'),
     dcc.Store(id='selected-retailer-store'),
     dcc.Store(id='analysis-results-store'),
+    # Callbacks that touch the database push status changes here; the interval
+    # only polls until the connection is up, or again after an error
+    dcc.Store(id='status-trigger'),
     dcc.Interval(id='connection-check-interval', interval=30000, n_intervals=0)  # Check every 30 seconds
 ], style={'maxWidth': '1200px', 'margin': '0 auto', 'padding': '20px'})
 
 @app.callback(
-    Output('connection-status', 'children'),
-    [Input('connection-check-interval', 'n_intervals')],
+    [Output('connection-status', 'children'),
+     Output('connection-check-interval', 'disabled')],
+    [Input('connection-check-interval', 'n_intervals'),
+     Input('status-trigger', 'data')],
     prevent_initial_call=False
 )
-def update_connection_status(n_intervals):
+def update_connection_status(n_intervals, status_trigger):
     """Update the connection status display."""
     status = get_connection_status()
     
@@ -415,7 +585,8 @@ def update_connection_status(n_intervals):
         'databricks_error': '#e74c3c',
         'token_error': '#e74c3c',
         'env_error': '#e74c3c',
-        'connection_error': '#e74c3c'
+        'connection_error': '#e74c3c',
+        'query_error': '#e74c3c'
     }
     
     status_icons = {
@@ -426,13 +597,14 @@ def update_connection_status(n_intervals):
         'databricks_error': '❌',
         'token_error': '❌',
         'env_error': '❌',
-        'connection_error': '❌'
+        'connection_error': '❌',
+        'query_error': '❌'
     }
     
     color = status_colors.get(status['status'], '#95a5a6')
     icon = status_icons.get(status['status'], '❓')
     
-    return html.Div([
+    status_display = html.Div([
         html.Span(f"{icon} Database Status: ", style={'fontWeight': 'bold'}),
         html.Span(status['message'], style={'color': color})
     ], style={
@@ -442,45 +614,47 @@ def update_connection_status(n_intervals):
         'borderRadius': '5px',
         'textAlign': 'center'
     })
+    # Stop polling once connected; a status-trigger push re-enables it on an error
+    return status_display, status['status'] == 'connected'
 
 @app.callback(
     [Output('orders-store', 'data'),
+     Output('adverse-events-store', 'data'),
      Output('selected-retailer-store', 'data'),
-     Output('search-message', 'children')],
+     Output('search-message', 'children'),
+     Output('status-trigger', 'data')],
     [Input('search-button', 'n_clicks'),
      Input('retailer-name-input', 'n_submit')],
-    [State('retailer-name-input', 'value')],
+    [State('retailer-name-input', 'value'),
+     State('status-trigger', 'data')],
     prevent_initial_call=True
 )
-def search_retailer_orders(search_clicks, submit_clicks, retailer_name):
-    """Search for orders by retailer name."""
+def search_retailer_orders(search_clicks, submit_clicks, retailer_name, last_status):
+    """Search for orders by retailer name and load adverse events for their devices."""
     if not retailer_name or not retailer_name.strip():
-        return [], None, html.Div("Please enter a retailer name.", style={'color': '#e74c3c'})
+        return {}, {}, None, html.Div("Please enter a retailer name.", style={'color': '#e74c3c'}), no_update
+    
+    dashboard_data = get_dashboard_data(retailer_name.strip())
+    status_update = status_trigger_update(last_status)
     
-    orders = get_retailer_orders(retailer_name.strip())
+    if dashboard_data is None:
+        message = html.Div("❌ Could not search orders: database error (see status above)", 
+                          style={'color': '#e74c3c'})
+        return {}, {}, retailer_name.strip(), message, status_update
     
-    if not orders:
+    orders, total_orders, adverse_events = dashboard_data
+    if not total_orders:
         message = html.Div(f"No orders found for retailer: {retailer_name}", 
                           style={'color': '#f39c12'})
-        return [], retailer_name.strip(), message
+        return {}, {}, retailer_name.strip(), message, status_update
     
-    message = html.Div(f"Found {len(orders)} orders for {retailer_name}", 
+    message = html.Div(f"Found {total_orders} orders for {retailer_name}", 
                       style={'color': '#27ae60'})
-    return orders, retailer_name.strip(), message
-
-@app.callback(
-    Output('adverse-events-store', 'data'),
-    [Input('orders-store', 'data')],
-    prevent_initial_call=True
-)
-def load_adverse_events(orders_data):
-    """Load adverse events for devices in the orders."""
-    if not orders_data:
-        return {}
-    
-    device_names = get_unique_device_names(orders_data)
-    adverse_events = get_device_adverse_events(device_names)
-    return adverse_events
+    # Only the first page is stored; other pages are fetched as the table asks for them.
+    # Adverse events are the largest payload, so they're stored gzipped (assets/ae.js
+    # decompresses them in the browser)
+    adverse_events_data = compress_store_data(adverse_events) if adverse_events else None
+    return {'orders': orders, 'total_orders': total_orders}, adverse_events_data, retailer_name.strip(), message, status_update
 
 @app.callback(
     Output('orders-container', 'children'),
@@ -489,16 +663,14 @@ def load_adverse_events(orders_data):
 )
 def display_orders(orders_data):
     """Display the orders table."""
-    if not orders_data:
+    if not orders_data or not orders_data.get('orders'):
         return html.Div("No orders to display.", 
                        style={'textAlign': 'center', 'color': '#7f8c8d', 'fontStyle': 'italic'})
     
-    # Convert to DataFrame for dash_table
-    df = pd.DataFrame(orders_data)
-    df['order_date'] = pd.to_datetime(df['order_date']).dt.strftime('%Y-%m-%d')
-    
+    # order_date is already formatted as YYYY-MM-DD by the query
     return dash_table.DataTable(
-        data=df.to_dict('records'),
+        id='orders-table',
+        data=orders_to_records(orders_data['orders']),
         columns=[
             {'name': 'Order ID', 'id': 'order_id', 'type': 'numeric'},
             {'name': 'Order Date', 'id': 'order_date', 'type': 'datetime'},
@@ -525,125 +697,96 @@ def display_orders(orders_data):
                 'backgroundColor': '#f8f9fa'
             }
         ],
-        sort_action='native',
-        page_size=10
+        page_action='custom',
+        page_current=0,
+        page_size=ORDERS_PAGE_SIZE,
+        page_count=max(1, -(-orders_data['total_orders'] // ORDERS_PAGE_SIZE)),
+        sort_action='custom',
+        sort_mode='single',
+        sort_by=[]
     )
 
+@app.callback(
+    [Output('orders-table', 'data'),
+     Output('status-trigger', 'data', allow_duplicate=True)],
+    [Input('orders-table', 'page_current'),
+     Input('orders-table', 'page_size'),
+     Input('orders-table', 'sort_by')],
+    [State('selected-retailer-store', 'data'),
+     State('status-trigger', 'data')],
+    prevent_initial_call=True
+)
+def update_orders_page(page_current, page_size, sort_by, retailer_name, last_status):
+    """Fetch the requested page of orders when the table is paged or sorted."""
+    if not retailer_name:
+        return [], no_update
+    
+    orders = get_orders_page(retailer_name, page_current or 0, page_size or ORDERS_PAGE_SIZE, sort_by)
+    return orders_to_records(orders), status_trigger_update(last_status)
+
 @app.callback(
     Output('adverse-events-container', 'children'),
     [Input('adverse-events-store', 'data')],
     prevent_initial_call=True
 )
 def display_adverse_events(adverse_events_data):
-    """Display adverse events with dropdowns for each device."""
+    """Display adverse events for all devices in one dropdown, grouped by device."""
     if not adverse_events_data:
         return html.Div("No adverse events found for the ordered devices.", 
                        style={'textAlign': 'center', 'color': '#7f8c8d', 'fontStyle': 'italic'})
     
-    device_sections = []
-    
-    for device_name, events in adverse_events_data.items():
-        if not events:
-            continue
-            
-        # Create dropdown options
-        dropdown_options = []
-        for i, event in enumerate(events):
-            severity_color = {
-                'High': '🔴',
-                'Medium': '🟡', 
-                'Low': '🟢'
-            }.get(event['severity_level'], '⚪')
-            
-            option_label = f"{severity_color} {event['event_date']} - {event['adverse_event_description'][:50]}..."
-            dropdown_options.append({
-                'label': option_label,
-                'value': i
-            })
-        
-        device_section = html.Div([
-            html.H4(f"📱 {device_name}", 
-                   style={'color': '#2c3e50', 'marginBottom': '10px'}),
-            html.P(f"Found {len(events)} adverse event(s)", 
-                  style={'color': '#7f8c8d', 'fontSize': '14px', 'marginBottom': '10px'}),
-            dcc.Dropdown(
-                id={'type': 'adverse-event-dropdown', 'device': device_name},
-                options=dropdown_options,
-                placeholder="Select an adverse event to view details...",
-                style={'marginBottom': '10px'}
-            ),
-            html.Div(id={'type': 'adverse-event-details', 'device': device_name})
-        ], style={
-            'marginBottom': '25px',
-            'padding': '20px',
-            'backgroundColor': '#fff5f5',
-            'border': '1px solid #fed7d7',
-            'borderRadius': '8px'
-        })
-        
-        device_sections.append(device_section)
-    
-    return device_sections
-
-@app.callback(
-    Output({'type': 'adverse-event-details', 'device': dash.MATCH}, 'children'),
-    [Input({'type': 'adverse-event-dropdown', 'device': dash.MATCH}, 'value')],
-    [State('adverse-events-store', 'data'),
-     State({'type': 'adverse-event-dropdown', 'device': dash.MATCH}, 'id')],
-    prevent_initial_call=True
-)
-def display_adverse_event_details(selected_event_index, adverse_events_data, dropdown_id):
-    """Display detailed information for the selected adverse event."""
-    if selected_event_index is None or not adverse_events_data:
-        return ""
-    
-    device_name = dropdown_id['device']
-    events = adverse_events_data.get(device_name, [])
-    
-    if selected_event_index >= len(events):
-        return ""
-    
-    event = events[selected_event_index]
-    
-    severity_style = {
-        'High': {'backgroundColor': '#fee', 'color': '#c53030', 'border': '1px solid #feb2b2'},
-        'Medium': {'backgroundColor': '#fffbeb', 'color': '#d69e2e', 'border': '1px solid #fbd38d'},
-        'Low': {'backgroundColor': '#f0fff4', 'color': '#38a169', 'border': '1px solid #9ae6b4'}
-    }.get(event['severity_level'], {'backgroundColor': '#f7fafc', 'color': '#4a5568', 'border': '1px solid #e2e8f0'})
+    adverse_events = decompress_store_data(adverse_events_data)
+    device_count = sum(1 for events in adverse_events.values() if events)
+    event_count = sum(len(events) for events in adverse_events.values())
     
+    # A single dropdown and details panel serve every device; options and event
+    # details are filled in clientside (assets/ae.js)
     return html.Div([
-        html.Div([
-            html.Strong("Event Date: "),
-            html.Span(str(event['event_date']))
-        ], style={'marginBottom': '10px'}),
-        html.Div([
-            html.Strong("Severity Level: "),
-            html.Span(event['severity_level'], 
-                     style={
-                         'padding': '4px 8px',
-                         'borderRadius': '4px',
-                         'fontWeight': 'bold',
-                         **severity_style
-                     })
-        ], style={'marginBottom': '10px'}),
-        html.Div([
-            html.Strong("Event Description: "),
-            html.P(event['adverse_event_description'], 
-                  style={'marginTop': '5px', 'lineHeight': '1.5'})
-        ])
+        html.H4(f"📱 {device_count} device(s)", 
+               style={'color': '#2c3e50', 'marginBottom': '10px'}),
+        html.P(f"Showing {event_count} recent adverse event(s), up to {ADVERSE_EVENTS_PER_DEVICE} per device", 
+              style={'color': '#7f8c8d', 'fontSize': '14px', 'marginBottom': '10px'}),
+        dcc.Dropdown(
+            id='adverse-event-dropdown',
+            options=[],
+            placeholder="Select an adverse event to view details...",
+            style={'marginBottom': '10px'}
+        ),
+        html.Div(id='adverse-event-details')
     ], style={
-        'padding': '15px',
-        'backgroundColor': '#ffffff',
-        'border': '1px solid #e2e8f0',
-        'borderRadius': '6px',
-        'marginTop': '10px'
+        'marginBottom': '25px',
+        'padding': '20px',
+        'backgroundColor': '#fff5f5',
+        'border': '1px solid #fed7d7',
+        'borderRadius': '8px'
     })
 
+app.clientside_callback(
+    ClientsideFunction(namespace='ae', function_name='eventOptions'),
+    Output('adverse-event-dropdown', 'options'),
+    [Input('adverse-event-dropdown', 'id')],
+    [State('adverse-events-store', 'data')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ae', function_name='renderDetails'),
+    Output('adverse-event-details', 'children'),
+    [Input('adverse-event-dropdown', 'value')],
+    [State('adverse-events-store', 'data')],
+    prevent_initial_call=True
+)
+
 @app.callback(
     [Output('analysis-results-store', 'data'),
      Output('analysis-loading', 'children')],
     [Input('analyze-event-button', 'n_clicks')],
     [State('adverse-event-input', 'value')],
+    background=True,
+    manager=background_callback_manager,
+    running=[
+        (Output('analyze-event-button', 'disabled'), True, False),
+        (Output('analyze-event-button', 'children'), '🔄 Analyzing...', 'Analyze Event')
+    ],
     prevent_initial_call=True
 )
 def analyze_adverse_event(n_clicks, event_description):
@@ -652,12 +795,6 @@ def analyze_adverse_event(n_clicks, event_description):
         return None, html.Div("Please enter an adverse event description.",
                              style={'color': '#e74c3c', 'fontStyle': 'italic'})
     
-    # Show loading message
-    loading_message = html.Div([
-        html.Span("🔄 Analyzing adverse event with AI... ", style={'marginRight': '10px'}),
-        html.Span("This may take a few seconds.", style={'fontStyle': 'italic', 'color': '#7f8c8d'})
-    ], style={'color': '#3498db', 'fontWeight': 'bold'})
-    
     # Call the analysis function
     result = analyze_adverse_event_with_databricks(event_description.strip())
     
@@ -715,7 +852,7 @@ def display_analysis_results(analysis_data):
         for key, value in data.items():
             if isinstance(value, (dict, list)):
                 # Format complex objects as JSON
-                formatted_value = json.dumps(value, indent=2)
+                formatted_value = orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
                 components.append(html.Div([
                     html.Strong(f"{key.replace('_', ' ').title()}: ", style={'color': '#2c3e50'}),
                     html.Pre(formatted_value, style={
@@ -744,4 +881,11 @@ def display_analysis_results(analysis_data):
         })
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    debug = True
+    # Open the connection pool and warm the caches in the background so the
+    # server can start listening. With debug on, the reloader's parent process
+    # only watches files, so only the child that serves requests warms up;
+    # Celery workers import this module without running this block
+    if workspace_client is not None and (not debug or is_running_from_reloader()):
+        threading.Thread(target=warm_up_database, name="db-warm-up", daemon=True).start()
+    app.run(debug=debug)
\ No newline at end of file
@@ -0,0 +1,115 @@
+// Clientside callbacks for the adverse events section. Selecting an event
+// only needs data already in adverse-events-store, so it never goes back to
+// the server. The store holds base64-encoded gzipped JSON (see
+// compress_store_data in app.py).
+
+const SEVERITY_ICONS = {
+    'High': '🔴',
+    'Medium': '🟡',
+    'Low': '🟢'
+};
+
+const SEVERITY_STYLES = {
+    'High': {'backgroundColor': '#fee', 'color': '#c53030', 'border': '1px solid #feb2b2'},
+    'Medium': {'backgroundColor': '#fffbeb', 'color': '#d69e2e', 'border': '1px solid #fbd38d'},
+    'Low': {'backgroundColor': '#f0fff4', 'color': '#38a169', 'border': '1px solid #9ae6b4'}
+};
+
+const DEFAULT_SEVERITY_STYLE = {'backgroundColor': '#f7fafc', 'color': '#4a5568', 'border': '1px solid #e2e8f0'};
+
+// Both callbacks read the same store value, so keep the last one decoded
+let decodedStore = {encoded: null, data: {}};
+
+async function decompressStoreData(encoded) {
+    if (!encoded) {
+        return {};
+    }
+    if (encoded !== decodedStore.encoded) {
+        const bytes = Uint8Array.from(atob(encoded), c => c.charCodeAt(0));
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        decodedStore = {encoded: encoded, data: JSON.parse(await new Response(stream).text())};
+    }
+    return decodedStore.data;
+}
+
+function htmlComponent(type, children, style) {
+    return {
+        type: type,
+        namespace: 'dash_html_components',
+        props: {children: children, style: style || {}}
+    };
+}
+
+// Option values are "<device index>:<event index>" into the decoded store
+function findEvent(adverseEvents, value) {
+    const [deviceIndex, eventIndex] = String(value).split(':').map(Number);
+    const device = Object.entries(adverseEvents)[deviceIndex];
+    return device ? device[1][eventIndex] : undefined;
+}
+
+function eventOptionLabel(event) {
+    const icon = SEVERITY_ICONS[event.severity_level] || '⚪';
+    const description = event.adverse_event_description || '';
+    return `${icon} ${event.event_date} - ${description.slice(0, 50)}...`;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ae: {
+        // Build the dropdown options for every device's events, each device's
+        // events under a disabled header option
+        eventOptions: async function(dropdownId, adverseEventsData) {
+            const adverseEvents = await decompressStoreData(adverseEventsData);
+            const options = [];
+            Object.entries(adverseEvents).forEach(([deviceName, events], deviceIndex) => {
+                if (!events || !events.length) {
+                    return;
+                }
+                options.push({label: `📱 ${deviceName}`, value: `device:${deviceIndex}`, disabled: true});
+                events.forEach((event, i) => {
+                    options.push({label: eventOptionLabel(event), value: `${deviceIndex}:${i}`});
+                });
+            });
+            return options;
+        },
+
+        // Show the details of the selected event
+        renderDetails: async function(selectedEvent, adverseEventsData) {
+            if (selectedEvent === null || selectedEvent === undefined || !adverseEventsData) {
+                return '';
+            }
+
+            const event = findEvent(await decompressStoreData(adverseEventsData), selectedEvent);
+            if (!event) {
+                return '';
+            }
+
+            const severityStyle = SEVERITY_STYLES[event.severity_level] || DEFAULT_SEVERITY_STYLE;
+
+            return htmlComponent('Div', [
+                htmlComponent('Div', [
+                    htmlComponent('Strong', 'Event Date: '),
+                    htmlComponent('Span', String(event.event_date))
+                ], {'marginBottom': '10px'}),
+                htmlComponent('Div', [
+                    htmlComponent('Strong', 'Severity Level: '),
+                    htmlComponent('Span', event.severity_level, Object.assign({
+                        'padding': '4px 8px',
+                        'borderRadius': '4px',
+                        'fontWeight': 'bold'
+                    }, severityStyle))
+                ], {'marginBottom': '10px'}),
+                htmlComponent('Div', [
+                    htmlComponent('Strong', 'Event Description: '),
+                    htmlComponent('P', event.adverse_event_description,
+                                  {'marginTop': '5px', 'lineHeight': '1.5'})
+                ])
+            ], {
+                'padding': '15px',
+                'backgroundColor': '#ffffff',
+                'border': '1px solid #e2e8f0',
+                'borderRadius': '6px',
+                'marginTop': '10px'
+            });
+        }
+    }
+});
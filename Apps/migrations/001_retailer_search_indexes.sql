@@ -0,0 +1,15 @@
+-- Indexes backing the retailer search query in app.py.
+--
+-- Run against the app's database with the schema from PGSCHEMA:
+--   psql -v schema=mma -f migrations/001_retailer_search_indexes.sql
+--
+-- CREATE INDEX CONCURRENTLY can't run inside a transaction block, so don't
+-- use psql's --single-transaction flag with this file.
+
+-- Case-insensitive retailer lookup: WHERE LOWER(retailer_name) = LOWER($1)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_retailer_lower
+    ON :"schema".synced_order_table_feallstars (LOWER(retailer_name));
+
+-- Join from the retailer's orders to their devices' adverse events
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_adverse_events_device_name
+    ON :"schema".synced_table_adverse_events (device_name);
@@ -0,0 +1,11 @@
+-- Refresh planner statistics after 001_retailer_search_indexes.sql.
+--
+-- Postgres only collects statistics for the LOWER(retailer_name) expression
+-- once the table is analyzed with the expression index in place. Until then
+-- the planner falls back to a default selectivity guess for the retailer
+-- filter.
+--
+--   psql -v schema=mma -f migrations/002_analyze_retailer_search_tables.sql
+
+ANALYZE :"schema".synced_order_table_feallstars;
+ANALYZE :"schema".synced_table_adverse_events;
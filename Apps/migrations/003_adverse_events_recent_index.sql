@@ -0,0 +1,14 @@
+-- Index backing the per-device "most recent adverse events" lookup in
+-- app.py (ORDER BY event_date DESC, severity_level LIMIT n per device).
+--
+--   psql -v schema=mma -f migrations/003_adverse_events_recent_index.sql
+--
+-- CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction block, so
+-- don't use psql's --single-transaction flag with this file.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_adverse_events_device_date
+    ON :"schema".synced_table_adverse_events (device_name, event_date DESC, severity_level);
+
+-- The new index starts with device_name, so it also serves plain device
+-- lookups and the single-column index from 001 is redundant
+DROP INDEX CONCURRENTLY IF EXISTS :"schema".idx_adverse_events_device_name;
@@ -0,0 +1,70 @@
+-- Function returning everything the dashboard shows after a retailer search
+-- in one round trip: the first page of orders (column-oriented), the
+-- retailer's total order count, and the most recent adverse events for each
+-- ordered device. app.py calls it as
+--   SELECT * FROM <schema>.get_retailer_dashboard($1, $2, $3)
+--
+--   psql -v schema=mma -f migrations/004_retailer_dashboard_function.sql
+--
+-- The function body can't see psql variables, so it resolves the tables via
+-- the search_path captured when it's created (SET search_path FROM CURRENT).
+-- json rather than jsonb keeps the devices in most-recent-event order.
+
+SET search_path TO :"schema";
+
+CREATE OR REPLACE FUNCTION :"schema".get_retailer_dashboard(
+    p_retailer_name text,
+    p_page_size integer,
+    p_events_per_device integer
+)
+RETURNS TABLE (orders json, total_orders bigint, adverse_events json)
+LANGUAGE sql
+STABLE
+SET search_path FROM CURRENT
+AS $$
+    WITH first_page AS (
+        SELECT order_id, TO_CHAR(order_date, 'YYYY-MM-DD') AS order_date, device_name, quantity,
+               COUNT(*) OVER () AS total_orders
+        FROM synced_order_table_feallstars
+        WHERE LOWER(retailer_name) = LOWER(p_retailer_name)  -- idx_order_retailer_lower
+        ORDER BY order_id
+        LIMIT p_page_size
+    ),
+    devices AS (
+        SELECT DISTINCT device_name
+        FROM synced_order_table_feallstars
+        WHERE LOWER(retailer_name) = LOWER(p_retailer_name)
+          AND device_name IS NOT NULL
+        LIMIT 1000
+    ),
+    device_events AS (
+        SELECT d.device_name,
+               MAX(ae.event_date) AS latest_event_date,
+               json_agg(json_build_object(
+                   'event_date', ae.event_date,
+                   'adverse_event_description', ae.adverse_event_description,
+                   'severity_level', ae.severity_level
+               ) ORDER BY ae.event_date DESC, ae.severity_level) AS events
+        FROM devices d
+        CROSS JOIN LATERAL (
+            SELECT event_date, adverse_event_description, severity_level
+            FROM synced_table_adverse_events
+            WHERE device_name = d.device_name  -- idx_adverse_events_device_date
+            ORDER BY event_date DESC, severity_level
+            LIMIT p_events_per_device
+        ) ae
+        GROUP BY d.device_name
+    )
+    SELECT
+        (SELECT json_build_object(
+            'order_id', COALESCE(json_agg(order_id ORDER BY order_id), '[]'),
+            'order_date', COALESCE(json_agg(order_date ORDER BY order_id), '[]'),
+            'device_name', COALESCE(json_agg(device_name ORDER BY order_id), '[]'),
+            'quantity', COALESCE(json_agg(quantity ORDER BY order_id), '[]')
+         ) FROM first_page),
+        (SELECT COALESCE(MAX(total_orders), 0) FROM first_page),
+        (SELECT COALESCE(json_object_agg(device_name, events ORDER BY latest_event_date DESC, device_name), '{}')
+         FROM device_events)
+$$;
+
+RESET search_path;
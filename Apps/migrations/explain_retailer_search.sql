@@ -0,0 +1,14 @@
+-- Show the plan for the app's retailer lookup (first page of orders). Run it
+-- before and after the migrations. The orders table should be read with
+-- "Index Scan" or "Bitmap Index Scan" on idx_order_retailer_lower, not
+-- "Seq Scan".
+--
+--   psql -v schema=mma -v retailer="'Some Retailer'" -f migrations/explain_retailer_search.sql
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT order_id, TO_CHAR(order_date, 'YYYY-MM-DD') AS order_date, device_name, quantity,
+       COUNT(*) OVER () AS total_orders
+FROM :"schema".synced_order_table_feallstars
+WHERE LOWER(retailer_name) = LOWER(:retailer)
+ORDER BY order_id
+LIMIT 10 OFFSET 0;